@@ -55,6 +55,25 @@ class ProcessCalculate:
 
         return dict(processed_areas)
     
+    @classmethod
+    def scale_areas(cls, areas: dict, scale: tuple) -> dict:
+        """
+        Area coordinates are scaled to the size of the decoded frame.
+
+        Args:
+            areas (dict): Coordinates of the areas.
+            scale (tuple): Horizontal and vertical scale factors.
+        Returns:
+            dict: Coordinates of the scaled areas.
+        """
+        scaled_areas = dict()
+        for name, coord in areas.items():
+            if isinstance(coord, dict):
+                scaled_areas[name] = cls.scale_areas(coord, scale)
+            else:
+                scaled_areas[name] = np.round(np.array(coord) * np.array(scale)).astype(np.int32)
+        return scaled_areas
+
     @staticmethod
     def area_coord_sorted(points: ndarray) -> ndarray:
         """
@@ -124,6 +143,26 @@ class ProcessCalculate:
                 self.num_detect[key][name] = 0
         self.num_detect = dict(self.num_detect)
         
+    def update_num_detect(self, masks: dict, kept: dict) -> None:
+        """
+        Counts of the kept areas are carried over to their new names, the other areas start from zero.
+
+        Args:
+            masks (dict): The areas to be processed.
+            kept (dict): Previous names of the unchanged areas, by their new names.
+        """
+        num_detect = dict()
+        in_detect = defaultdict(lambda: defaultdict(set))
+        for key in masks.keys():
+            if key in kept:
+                num_detect[key] = self.num_detect[kept[key]]
+                if kept[key] in self.in_detect:
+                    in_detect[key] = self.in_detect[kept[key]]
+            else:
+                num_detect[key] = {"in": 0, "out": 0}
+        self.num_detect = num_detect
+        self.in_detect = in_detect
+
     @staticmethod
     def get_detections(results, task):
         """
@@ -142,7 +181,12 @@ class ProcessCalculate:
         detections["class_id"] = results.boxes.cls.cpu().numpy().astype(int)
 
         if task == "Track":
-            detections["track_id"] = results.boxes.id.cpu().numpy().astype(int)
+            if results.boxes.id is None:
+                # No tracked detections on this frame.
+                detections = {key: value[:0] for key, value in detections.items()}
+                detections["track_id"] = np.empty(0, dtype=int)
+            else:
+                detections["track_id"] = results.boxes.id.cpu().numpy().astype(int)
 
         return detections
 
@@ -0,0 +1,223 @@
+import os
+import cv2
+import queue
+import logging
+import threading
+import numpy as np
+from collections import deque
+from numpy import ndarray
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+
+class ProcessClip:
+    def __init__(self, imgsz: tuple, fps: int, pre_seconds: float = 5, post_seconds: float = 5,
+                 jpeg_quality: Optional[int] = None, count_threshold: Optional[int] = None,
+                 save_dir: str = "./clips", timeout: float = 1.0):
+        """
+        Short clips are saved around the events instead of the whole video.
+
+        The frames before an event are kept in one ring read in order by the writer. Raw frames
+        take pre_seconds * fps frames of memory, about 900 MB for 5 seconds of 1080p at 30 fps,
+        JPEG frames a small part of it at the cost of encoding every frame.
+
+        Args:
+            imgsz (tuple): The size of the video frame.
+            fps (int): Frame rate of the video.
+            pre_seconds (float): Seconds kept before an event.
+            post_seconds (float): Seconds recorded after the last event of a clip.
+            jpeg_quality (int): JPEG quality of the kept frames, raw frames if None.
+            count_threshold (int): Number of people in an area that triggers an event, disabled if None.
+            save_dir (str): Directory where the clips are saved.
+            timeout (float): Polling period while waiting for the writer, it is checked in between.
+        """
+        self.imgsz = imgsz
+        self.fps = fps
+        self.num_pre = max(int(pre_seconds * fps), 1)
+        self.num_post = max(int(post_seconds * fps), 1)
+        self.jpeg_quality = jpeg_quality
+        self.count_threshold = count_threshold
+        self.save_dir = save_dir
+        self.timeout = timeout
+        if jpeg_quality is None:
+            self.buffer = np.empty((self.num_pre, *imgsz, 3), dtype=np.uint8)
+        else:
+            self.buffer = [None] * self.num_pre
+        self.num_frames = 0
+        self.remaining = 0
+        self._total = 0
+        self._above = set()
+        # Frame ranges of the clips still to be read from the ring, [start, end] with end None while recording.
+        self._clips = deque()
+        self._next_start = 0
+        # Number of the next frame the writer reads from the ring.
+        self._read = 0
+        self._cond = threading.Condition()
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self.write, daemon=True)
+        self._thread.start()
+
+    def track_event(self, num_detect: dict) -> bool:
+        """
+        Args:
+            num_detect (dict): Number of people passing through entrance and exit.
+        Returns:
+            bool: A crossing is recorded since the last frame.
+        """
+        total = sum(sum(counts.values()) for counts in num_detect.values())
+        event = total > self._total
+        self._total = total
+        return event
+
+    def count_event(self, area_counts: dict) -> bool:
+        """
+        Args:
+            area_counts (dict): Number of people in the areas.
+        Returns:
+            bool: An area count reached the threshold since the last frame.
+        """
+        if self.count_threshold is None:
+            return False
+        above = {key for key, count in area_counts.items() if count >= self.count_threshold}
+        event = bool(above - self._above)
+        self._above = above
+        return event
+
+    def encode(self, frame: ndarray):
+        """
+        Args:
+            frame (ndarray): Video frame.
+        Returns:
+            ndarray: JPEG bytes of the frame.
+        """
+        return cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, self.jpeg_quality])[1]
+
+    def wait_slot(self, frame_number: int) -> None:
+        """
+        Waits until the writer has read the frame whose ring slot is to be overwritten.
+
+        Args:
+            frame_number (int): Frame number in the ring slot.
+        Raises:
+            RuntimeError: The clip writer has stopped.
+        """
+        while self._clips and self._clips[0][1] is not None and self._clips[0][1] < frame_number:
+            self._clips.popleft()
+        if not self._clips or frame_number < self._clips[0][0]:
+            return
+        with self._cond:
+            while self._read <= frame_number:
+                if not self._thread.is_alive():
+                    raise RuntimeError("Clip writer has stopped")
+                self._cond.wait(self.timeout)
+
+    def push(self, frame: ndarray, frame_id: int, event: bool) -> None:
+        """
+        The frame is kept in the ring, and read by the writer while a clip is recorded.
+
+        Args:
+            frame (ndarray): Processed video frame.
+            frame_id (int): Frame number of the video.
+            event (bool): An event occurred on this frame.
+        Raises:
+            RuntimeError: The clip writer has stopped.
+        """
+        if not self._thread.is_alive():
+            raise RuntimeError("Clip writer has stopped")
+        if event and not self.remaining:
+            # Frames already saved in the previous clip are not repeated.
+            start = max(self.num_frames - self.num_pre, self._next_start)
+            self._clips.append([start, None])
+            self._queue.put((os.path.join(self.save_dir, f"event_{frame_id:08d}.mp4"), start))
+            if start < self.num_frames:
+                # The kept frames are written right away, so their slots are freed in order.
+                self._queue.put(self.num_frames - 1)
+        if event:
+            self.remaining = self.num_post
+
+        kept = frame if self.jpeg_quality is None else self.encode(frame)
+        self.wait_slot(self.num_frames - self.num_pre)
+        self.buffer[self.num_frames % self.num_pre] = kept
+        if self.remaining:
+            self._queue.put(self.num_frames)
+            self.remaining -= 1
+            if not self.remaining:
+                self._clips[-1][1] = self.num_frames
+                self._next_start = self.num_frames + 1
+                self._queue.put(None)
+        self.num_frames += 1
+
+    def open_clip(self, file_path: str):
+        """
+        Args:
+            file_path (str): Path of the clip.
+        Returns:
+            VideoWriter: Writer of the clip, None if it could not be opened.
+        """
+        try:
+            os.makedirs(self.save_dir, exist_ok=True)
+            fourcc = cv2.VideoWriter_fourcc(*"mp4v")
+            out = cv2.VideoWriter(file_path, fourcc, self.fps, (self.imgsz[1], self.imgsz[0]))
+            if out.isOpened():
+                return out
+            logger.error("Event clip could not be opened at %s", file_path)
+        except Exception:
+            logger.exception("Event clip could not be opened at %s", file_path)
+        return None
+
+    def write(self) -> None:
+        """Clips are encoded in the background from the frames in the ring."""
+        out = None
+        recording = False
+        position = 0
+        while True:
+            item = self._queue.get()
+            if item is None and not recording:
+                break
+            if isinstance(item, tuple):
+                file_path, position = item
+                recording = True
+                out = self.open_clip(file_path)
+            elif item is None:
+                recording = False
+                if out is not None:
+                    try:
+                        out.release()
+                    except Exception:
+                        logger.exception("Event clip could not be finished in %s", self.save_dir)
+                    out = None
+            else:
+                for frame_number in range(position, item + 1):
+                    if out is not None:
+                        try:
+                            self.write_frame(out, self.buffer[frame_number % self.num_pre])
+                        except Exception:
+                            # The rest of the clip is skipped, the ring is still read so the frame loop never waits on it.
+                            logger.exception("Event clip could not be written to %s", self.save_dir)
+                            out = None
+                    with self._cond:
+                        self._read = frame_number + 1
+                        self._cond.notify()
+                position = item + 1
+
+    @staticmethod
+    def write_frame(out, frame) -> None:
+        """
+        Args:
+            out (VideoWriter): Writer of the clip.
+            frame (-): Video frame, or its JPEG bytes.
+        """
+        if frame.ndim == 1:
+            frame = cv2.imdecode(frame, cv2.IMREAD_COLOR)
+        out.write(frame)
+
+    def close(self) -> None:
+        """The clip being recorded is finished and the writer is stopped."""
+        if not self._thread.is_alive():
+            return
+        if self.remaining:
+            self.remaining = 0
+            self._queue.put(None)
+        self._queue.put(None)
+        self._thread.join()
@@ -1,15 +1,22 @@
 import cv2
+import numpy as np
 from input import SetInput
-from utils import CFGRead, JSONFile
+from utils import CFGRead, CFGWatcher, JSONFile
 from model import YOLOModel
 from draw import ProcessDraw
 from video import ProcessVideo
 from calculate import ProcessCalculate
+from heatmap import ProcessHeatmap
+from clip import ProcessClip
+from tracker import ProcessTracker
+from pipeline import FramePipeline
 from numpy import ndarray
+from typing import Iterator, Optional, Tuple
 
 
 class CVTask:
-    def __init__(self, cfg: JSONFile, model_path: str, save: bool) -> None:
+    def __init__(self, cfg: JSONFile, model_path: str, save: bool, parallel: bool = False,
+                 cfg_path: Optional[str] = None) -> None:
         """
         Computer Vision Task.
 
@@ -17,23 +24,176 @@ class CVTask:
             cfg (JSONFile): cfg.
             model_path (str): Path to the model file.
             save (bool): Recording the processed video.
+            parallel (bool): Decoding and inference in separate processes.
+            cfg_path (str): Path to cfg file, the areas are reloaded when it changes if given.
         """
         self.cfg = cfg
         self.model_path = model_path
         self.save = save
+        self.parallel = parallel
+        self.cfg_path = cfg_path
+        self.watcher = None
         self.calc = ProcessCalculate()
         self.draw = ProcessDraw()
+        self.heatmap = None
+        self.clips = None
+        self.clip_event = False
+        self.tracker = None
         self.areas = None
 
     def frame_show_save(self, frame, process):
         cv2.imshow("", frame)
         if self.save:
             process.out.write(frame)
+        if self.clips:
+            self.clips.push(frame, self.calc.frame_id, self.clip_event)
 
-        if cv2.waitKey(1) & 0xFF == ord("q"):
+        key = cv2.waitKey(1) & 0xFF
+        if key == ord("r") and self.watcher:
+            self.watcher.request()
+        if key == ord("q"):
             return True
 
-    def process_frame(self, frame, zones, results, frame_id):
+    def get_zones(self, areas: dict, process: ProcessVideo) -> Tuple[dict, dict]:
+        raise NotImplementedError
+
+    def reset_counts(self, masks: dict, kept: dict) -> None:
+        raise NotImplementedError
+
+    def set_watcher(self, process: ProcessVideo, masks: dict) -> None:
+        """
+        Cfg file watcher is started if a cfg path is given.
+
+        Args:
+            process (ProcessVideo): Video being processed.
+            masks (dict): Current masks of the areas.
+        """
+        if self.cfg_path:
+            zones = (self.cfg.areas, self.areas, masks)
+            self.watcher = CFGWatcher(self.cfg_path, lambda areas, built: self.build_zones(areas, built, process),
+                                      zones).start()
+
+    def close_watcher(self) -> None:
+        """Cfg file watcher is stopped."""
+        if self.watcher:
+            self.watcher.stop()
+
+    def build_zones(self, areas: dict, built: tuple, process: ProcessVideo) -> tuple:
+        """
+        Zones are rebuilt from the cfg, only the new or changed areas are rasterized.
+
+        Args:
+            areas (dict): Coordinates of the areas in the cfg.
+            built (tuple): Areas of the cfg, processed areas and masks of the previous build.
+            process (ProcessVideo): Video being processed.
+        Returns:
+            tuple: Areas of the cfg, processed areas and masks.
+        """
+        old_areas, old_processed, old_masks = built
+        # Masks are named by position, so areas are matched by their cfg name, then by their coordinates.
+        old = {key: (name, coord) for name, (key, coord) in zip(old_masks.keys(), old_areas.items())}
+        matched = dict()
+        for key, coord in areas.items():
+            if key in old and np.array_equal(old[key][1], coord):
+                matched[key] = (key, old.pop(key)[0])
+        for key, coord in areas.items():
+            if key in matched:
+                continue
+            for old_key, (old_name, old_coord) in old.items():
+                if np.array_equal(old_coord, coord):
+                    matched[key] = (old_key, old.pop(old_key)[0])
+                    break
+
+        changed = {key: coord for key, coord in areas.items() if key not in matched}
+        changed_processed, changed_masks = self.get_zones(changed, process) if changed else (dict(), dict())
+        changed_masks = iter(changed_masks.values())
+        processed, masks = dict(), dict()
+        for i, key in enumerate(areas.keys(), 1):
+            if key in matched:
+                old_key, old_name = matched[key]
+                processed[key] = old_processed[old_key]
+                masks["area" + str(i)] = old_masks[old_name]
+            else:
+                processed[key] = changed_processed[key]
+                masks["area" + str(i)] = next(changed_masks)
+        return areas, processed, masks
+
+    def update_zones(self, masks: dict) -> dict:
+        """
+        Zones rebuilt by the watcher are swapped in between frames.
+
+        Args:
+            masks (dict): Current masks of the areas.
+        Returns:
+            dict: Masks of the areas to be used from this frame.
+        """
+        zones = self.watcher.pop() if self.watcher else None
+        if zones is None:
+            return masks
+
+        cfg_areas, self.areas, new_masks = zones
+        # Unchanged areas keep the mask object of the previous build.
+        names = {id(mask): name for name, mask in masks.items()}
+        kept = {name: names[id(mask)] for name, mask in new_masks.items() if id(mask) in names}
+        self.cfg.get_cfg_dict["areas"] = cfg_areas
+        self.reset_counts(new_masks, kept)
+        return new_masks
+
+    def set_heatmap(self, process: ProcessVideo) -> None:
+        """
+        Heatmap is created if it is set in the cfg.
+
+        Args:
+            process (ProcessVideo): Video being processed.
+        """
+        if self.cfg.heatmap is not None:
+            self.heatmap = ProcessHeatmap(process.imgsz, **{"fps": process.fps, **self.cfg.heatmap})
+
+    def close_heatmap(self) -> None:
+        """Heatmap is saved."""
+        if self.heatmap:
+            self.heatmap.close()
+
+    def set_clips(self, process: ProcessVideo) -> None:
+        """
+        Event clips are recorded if they are set in the cfg.
+
+        Args:
+            process (ProcessVideo): Video being processed.
+        """
+        if self.cfg.clips is not None:
+            self.clips = ProcessClip(process.imgsz, process.fps, **self.cfg.clips)
+
+    def close_clips(self) -> None:
+        """The last event clip is written."""
+        if self.clips:
+            self.clips.close()
+
+    def get_frames(self, process: ProcessVideo) -> Iterator[tuple]:
+        """
+        Video frames and their detections.
+
+        Args:
+            process (ProcessVideo): Video being processed.
+        Returns:
+            Iterator[tuple]: Frame number, video frame and detections.
+        """
+        # Track ids of the native tracker are assigned after detection.
+        task = "Detect" if self.tracker else self.cfg.task
+        detect_every = self.tracker.detect_every if self.tracker else 1
+        if self.parallel:
+            with FramePipeline(process.reader, self.model_path, task, process.imgsz, detect_every) as pipeline:
+                yield from pipeline
+        else:
+            model = YOLOModel(self.model_path, task)
+            for frame_id, frame in process.video_frames:
+                if (frame_id - 1) % detect_every:
+                    yield frame_id, frame, None
+                    continue
+                results = model(frame)
+                yield frame_id, frame, self.calc.get_detections(results[0], task)
+
+    def process_frame(self, frame, zones, detections, frame_id):
         raise NotImplementedError
 
     def process(self):
@@ -41,7 +201,8 @@ class CVTask:
 
 
 class PeopleCounter(CVTask):
-    def __init__(self, cfg: JSONFile, model_path: str, save: bool) -> None:
+    def __init__(self, cfg: JSONFile, model_path: str, save: bool, parallel: bool = False,
+                 cfg_path: Optional[str] = None) -> None:
         """
         People Counter.
 
@@ -49,48 +210,83 @@ class PeopleCounter(CVTask):
             cfg (JSONFile): cfg.
             model_path (str): Path to the model file.
             save (bool): Recording the processed video.
+            parallel (bool): Decoding and inference in separate processes.
+            cfg_path (str): Path to cfg file, the areas are reloaded when it changes if given.
         """
-        super().__init__(cfg, model_path, save)
+        super().__init__(cfg, model_path, save, parallel, cfg_path)
 
-    def process_frame(self, frame: ndarray, masks: dict, results, frame_id: int) -> ndarray:
+    def process_frame(self, frame: ndarray, masks: dict, detections: dict, frame_id: int) -> ndarray:
         """
         Frame processed.
 
         Args:
             frame (ndarray): Video frame to be processed.
             masks (dict): Areas to be estimated in video frames.
-            results (-): Results of the model.
+            detections (dict): Detections of the model.
             frame_id (int): Frame number of the video.
         Returns:
             ndarray : Processed video frame.
         """
         self.calc.frame_id = frame_id
-        self.calc.detections = self.calc.get_detections(results, self.cfg.task)
+        self.calc.detections = detections
         self.calc.to_center_base(self.calc.detections)
+        if self.heatmap:
+            self.heatmap.update(self.calc.detections["xyxy"])
         area_counts, in_detect = self.calc.count_area(masks)
+        if self.clips:
+            self.clip_event = self.clips.count_event(area_counts)
 
         frame = self.draw.draw_elips(frame, in_detect)
-        frame = self.draw.draw_area(frame, self.cfg.areas, self.cfg.task)
+        frame = self.draw.draw_area(frame, self.areas, self.cfg.task)
         frame = self.draw.draw_info(frame, area_counts)
 
         return frame
 
+    def get_zones(self, areas: dict, process: ProcessVideo) -> Tuple[dict, dict]:
+        """
+        Areas and their masks are created.
+
+        Args:
+            areas (dict): Coordinates of the areas in the cfg.
+            process (ProcessVideo): Video being processed.
+        Returns:
+            Tuple[dict, dict]: Processed areas and their masks.
+        """
+        areas = self.calc.scale_areas(areas, process.scale)
+        return areas, self.calc.get_area_mask(areas, process.imgsz, self.cfg.task)
+
+    def reset_counts(self, masks: dict, kept: dict) -> None:
+        """
+        Counts are recreated for the new areas.
+
+        Args:
+            masks (dict): The areas to be processed.
+            kept (dict): Previous names of the unchanged areas, by their new names.
+        """
+        self.calc.area_counts = dict()
+        self.calc.create_area_counts(masks)
+
     def process(self):
         """Process"""
-        with ProcessVideo(source_path=self.cfg.video_path, save=self.save) as process:
-            model = YOLOModel(self.model_path, self.cfg.task)
-            masks = self.calc.get_area_mask(self.cfg.areas, process.imgsz, self.cfg.task)
+        with ProcessVideo(source_path=self.cfg.video_path, save=self.save, **self.cfg.decoder) as process:
+            self.areas, masks = self.get_zones(self.cfg.areas, process)
             self.calc.create_area_counts(masks)
+            self.set_heatmap(process)
+            self.set_watcher(process, masks)
+            self.set_clips(process)
 
-            for frame_id, frame in process.video_frames:
-                results = model(frame)
-                frame = self.process_frame(frame, masks, results[0], frame_id)
+            for frame_id, frame, detections in self.get_frames(process):
+                masks = self.update_zones(masks)
+                frame = self.process_frame(frame, masks, detections, frame_id)
                 if self.frame_show_save(frame, process):
                     break
+            self.close_watcher()
+            self.close_heatmap()
+            self.close_clips()
                     
                     
 class PeopleTracker(CVTask):
-    def __init__(self, cfg, model_path, save):
+    def __init__(self, cfg, model_path, save, parallel=False, cfg_path=None):
         """
         People Tracker.
 
@@ -98,47 +294,84 @@ class PeopleTracker(CVTask):
             cfg (JSONFile): cfg.
             model_path (str): Path to the model file.
             save (bool): Recording the processed video.
+            parallel (bool): Decoding and inference in separate processes.
+            cfg_path (str): Path to cfg file, the areas are reloaded when it changes if given.
         """
-        super().__init__(cfg, model_path, save)
+        super().__init__(cfg, model_path, save, parallel, cfg_path)
 
-    def process_frame(self, frame: ndarray, masks: dict, results, frame_id: int) -> ndarray:
+    def process_frame(self, frame: ndarray, masks: dict, detections: dict, frame_id: int) -> ndarray:
         """
         Frame processed.
 
         Args:
             frame (ndarray): Video frame to be processed.
             masks (dict): Areas to be estimated in video frames.
-            results (-): Results of the model.
+            detections (dict): Detections of the model, None on frames without detection.
             frame_id (int): Frame number of the video.
         Returns:
             ndarray : Processed video frame.
         """
         self.calc.frame_id = frame_id
-        self.calc.detections = self.calc.get_detections(results, self.cfg.task)
+        self.calc.detections = self.tracker(detections) if self.tracker else detections
+        if self.heatmap:
+            self.heatmap.update(self.calc.detections["xywh"])
         num_detect, in_detect, detect_xyxy = self.calc.track_area(masks)
+        if self.clips:
+            self.clip_event = self.clips.track_event(num_detect)
         frame = self.draw.draw_boxes(frame, detect_xyxy)
         frame = self.draw.draw_area(frame, self.areas, self.cfg.task)
         frame = self.draw.draw_track_info(frame, num_detect)
 
         return frame
     
+    def get_zones(self, areas: dict, process: ProcessVideo) -> Tuple[dict, dict]:
+        """
+        Areas and their masks are created from the lines.
+
+        Args:
+            areas (dict): Coordinates of the lines in the cfg.
+            process (ProcessVideo): Video being processed.
+        Returns:
+            Tuple[dict, dict]: Processed areas and their masks.
+        """
+        areas = self.calc.line_shift(areas, process.source_imgsz)
+        areas = self.calc.scale_areas(areas, process.scale)
+        return areas, self.calc.get_area_mask(areas, process.imgsz, self.cfg.task)
+
+    def reset_counts(self, masks: dict, kept: dict) -> None:
+        """
+        Counts of the unchanged areas are kept, the other areas are reset.
+
+        Args:
+            masks (dict): The areas to be processed.
+            kept (dict): Previous names of the unchanged areas, by their new names.
+        """
+        self.calc.update_num_detect(masks, kept)
+
     def process(self):
         """Process"""
-        with ProcessVideo(source_path=self.cfg.video_path, save=self.save) as process:
-            model = YOLOModel(self.model_path, self.cfg.task)
-            self.areas = self.calc.line_shift(self.cfg.areas, process.imgsz)
-            masks = self.calc.get_area_mask(self.areas, process.imgsz, self.cfg.task)
+        with ProcessVideo(source_path=self.cfg.video_path, save=self.save, **self.cfg.decoder) as process:
+            self.areas, masks = self.get_zones(self.cfg.areas, process)
             self.calc.create_num_detect(masks)
+            self.set_heatmap(process)
+            self.set_watcher(process, masks)
+            self.set_clips(process)
+            if self.cfg.tracker is not None:
+                self.tracker = ProcessTracker(process.imgsz, **self.cfg.tracker)
 
-            for frame_id, frame in process.video_frames:
-                results = model(frame)
-                frame = self.process_frame(frame, masks, results[0], frame_id)
+            for frame_id, frame, detections in self.get_frames(process):
+                masks = self.update_zones(masks)
+                frame = self.process_frame(frame, masks, detections, frame_id)
                 if self.frame_show_save(frame, process):
                     break
+            self.close_watcher()
+            self.close_heatmap()
+            self.close_clips()
 
 
 class PeopleTrackingMonitor:
-    def __init__(self, cfg_path: str, model_path: str, save: bool = False) -> None:
+    def __init__(self, cfg_path: str, model_path: str, save: bool = False, parallel: bool = False,
+                 reload: bool = False) -> None:
         """
         People Tracking Monitor.
 
@@ -146,10 +379,14 @@ class PeopleTrackingMonitor:
             cfg_path (str): Path to cfg file.
             model_path (str): Path to the model file.
             save (bool): Recording the processed video.
+            parallel (bool): Decoding and inference in separate processes.
+            reload (bool): Reloading the areas when the cfg file changes or R is pressed.
         """
         self.cfg_path = cfg_path
         self.model_path = model_path
         self.save = save
+        self.parallel = parallel
+        self.reload = reload
         self.cfg = None
         self._tasks = {
             "Count": PeopleCounter,
@@ -192,5 +429,7 @@ class PeopleTrackingMonitor:
         if areas:
             self.cfg_write(self.cfg_path, areas)
 
-        people_process = self._tasks[self.cfg.task](cfg=self.cfg, model_path=self.model_path, save=self.save)
+        people_process = self._tasks[self.cfg.task](cfg=self.cfg, model_path=self.model_path, save=self.save,
+                                                 parallel=self.parallel,
+                                                 cfg_path=self.cfg_path if self.reload else None)
         people_process.process()
@@ -0,0 +1,164 @@
+import os
+import time
+import queue
+import logging
+import threading
+import cv2
+import numpy as np
+from numpy import ndarray
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+
+class ProcessHeatmap:
+    def __init__(self, imgsz: tuple, cell_size: int = 8, half_life: Optional[float] = None, fps: int = 30,
+                 hourly: bool = False, save_dir: str = "./heatmap", save_every: int = 0, save_type: str = "npz"):
+        """
+        Foot traffic heatmap accumulated on a downsampled grid.
+
+        Args:
+            imgsz (tuple): The size of the video frame.
+            cell_size (int): Size of a grid cell in pixels.
+            half_life (float): Half-life of the decayed layer in seconds, disabled if None.
+            fps (int): Frame rate of the video, used for the decayed layer.
+            hourly (bool): Keeping a separate layer for each hour of the day.
+            save_dir (str): Directory where the snapshots are saved.
+            save_every (int): Snapshot period in frames, disabled if 0.
+            save_type (str): Snapshot format, "npz" or "png".
+        """
+        self.imgsz = imgsz
+        self.cell_size = cell_size
+        self.grid_shape = (-(-imgsz[0] // cell_size), -(-imgsz[1] // cell_size))
+        self.total = np.zeros(self.grid_shape, dtype=np.uint32)
+        self.decayed = None
+        self.hourly = dict() if hourly else None
+        self.save_dir = save_dir
+        self.save_every = save_every
+        self.save_type = save_type
+        self.num_frames = 0
+        self._decay = None
+        self._scale = 1.0
+        if half_life:
+            self.decayed = np.zeros(self.grid_shape, dtype=np.float32)
+            self._decay = 0.5 ** (1 / (half_life * fps))
+        # Snapshots are written in the background, a newer one is skipped while one is pending.
+        self._queue = queue.Queue(maxsize=1)
+        self._thread = None
+        if save_every:
+            self._thread = threading.Thread(target=self.write, daemon=True)
+            self._thread.start()
+
+    def get_cells(self, points: ndarray) -> ndarray:
+        """
+        Points are converted to flat grid cell indices.
+
+        Args:
+            points (ndarray): Pixel coordinates of the points, (N, 2) as x, y.
+        Returns:
+            ndarray: Flat indices of the grid cells.
+        """
+        cells = np.asarray(points)[:, :2].astype(np.intp) // self.cell_size
+        np.clip(cells[:, 0], 0, self.grid_shape[1] - 1, out=cells[:, 0])
+        np.clip(cells[:, 1], 0, self.grid_shape[0] - 1, out=cells[:, 1])
+        return cells[:, 1] * self.grid_shape[1] + cells[:, 0]
+
+    def update(self, points: ndarray, timestamp: Optional[float] = None) -> None:
+        """
+        Points of the frame are added to the layers.
+
+        Args:
+            points (ndarray): Pixel coordinates of the points, (N, 2) as x, y.
+            timestamp (float): Time of the frame, the current time if None.
+        """
+        self.num_frames += 1
+        if self._decay:
+            # The layer is stored divided by the decay so far, so a frame costs a
+            # scalar update instead of a pass over the grid.
+            self._scale *= self._decay
+            if self._scale < 1e-3:
+                self.decayed *= self._scale
+                self._scale = 1.0
+
+        if len(points):
+            # One scatter-add per frame, the cell counts are then added to every layer.
+            counts = np.bincount(self.get_cells(points), minlength=self.total.size).astype(np.uint32)
+            counts = counts.reshape(self.grid_shape)
+            self.total += counts
+            if self._decay:
+                self.decayed += counts * np.float32(1 / self._scale)
+            if self.hourly is not None:
+                hour = time.localtime(timestamp).tm_hour
+                if hour not in self.hourly:
+                    self.hourly[hour] = np.zeros(self.grid_shape, dtype=np.uint32)
+                self.hourly[hour] += counts
+
+        if self.save_every and self.num_frames % self.save_every == 0:
+            layers = {name: layer.copy() for name, layer in self.layers.items()}
+            try:
+                self._queue.put_nowait(layers)
+            except queue.Full:
+                pass
+
+    @property
+    def layers(self) -> dict:
+        """
+        Returns:
+            dict: Heatmap layers by name.
+        """
+        layers = {"total": self.total}
+        if self._decay:
+            layers["decayed"] = self.decayed * np.float32(self._scale)
+        if self.hourly:
+            for hour, layer in self.hourly.items():
+                layers[f"hour{hour:02d}"] = layer
+        return layers
+
+    @staticmethod
+    def to_image(layer: ndarray, imgsz: Optional[tuple] = None) -> ndarray:
+        """
+        The layer is converted to a color image.
+
+        Args:
+            layer (ndarray): Heatmap layer.
+            imgsz (tuple): Size of the output image, the grid size if None.
+        Returns:
+            ndarray: Color heatmap image.
+        """
+        peak = layer.max()
+        image = (layer * (255 / peak) if peak else np.zeros(layer.shape)).astype(np.uint8)
+        if imgsz:
+            image = cv2.resize(image, (imgsz[1], imgsz[0]), interpolation=cv2.INTER_NEAREST)
+        return cv2.applyColorMap(image, cv2.COLORMAP_JET)
+
+    def save(self, layers: Optional[dict] = None) -> None:
+        """
+        Snapshot of the layers is saved.
+
+        Args:
+            layers (dict): Layers to be saved, the current layers if None.
+        """
+        layers = self.layers if layers is None else layers
+        os.makedirs(self.save_dir, exist_ok=True)
+        if self.save_type == "npz":
+            np.savez_compressed(os.path.join(self.save_dir, "heatmap.npz"), cell_size=self.cell_size, **layers)
+        elif self.save_type == "png":
+            for name, layer in layers.items():
+                cv2.imwrite(os.path.join(self.save_dir, f"{name}.png"), self.to_image(layer))
+        else:
+            raise ValueError(f"Unsupported heatmap type: {self.save_type}")
+
+    def write(self) -> None:
+        """Snapshots are saved in the background."""
+        for layers in iter(self._queue.get, None):
+            try:
+                self.save(layers)
+            except Exception:
+                logger.exception("Heatmap snapshot could not be saved to %s", self.save_dir)
+
+    def close(self) -> None:
+        """The snapshot writer is stopped and the final layers are saved."""
+        if self._thread:
+            self._queue.put(None)
+            self._thread.join()
+        self.save()
@@ -22,7 +22,7 @@ class YOLOModel(Model):
         self.model = YOLO(self.model_path)
 
     def __call__(self, frame):
-        if self.task == "Count":
+        if self.task in ["Count", "Detect"]:
             return self.model.predict(frame, classes=[0])
         elif self.task == "Track":
             return self.model.track(frame, persist=True, classes=[0])
@@ -0,0 +1,214 @@
+import queue
+import numpy as np
+import multiprocessing as mp
+from multiprocessing import shared_memory
+from typing import Callable, Iterator
+from model import YOLOModel
+from calculate import ProcessCalculate
+
+
+class SharedFrameRing:
+    def __init__(self, num_slots: int, shape: tuple, ctx=mp) -> None:
+        """
+        Video frames kept in fixed size slots of a shared memory block.
+
+        Args:
+            num_slots (int): Number of frame slots.
+            shape (tuple): Shape of a video frame.
+            ctx (-): Multiprocessing context.
+        """
+        self.num_slots = num_slots
+        self.shape = tuple(shape)
+        self.shm = shared_memory.SharedMemory(create=True, size=num_slots * int(np.prod(self.shape)))
+        self.frames = np.ndarray((num_slots, *self.shape), dtype=np.uint8, buffer=self.shm.buf)
+        self.refs = ctx.Array("i", num_slots)
+        self.free = ctx.Queue()
+        self._owner = True
+        for slot in range(num_slots):
+            self.free.put(slot)
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["shm"] = self.shm.name
+        del state["frames"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.shm = shared_memory.SharedMemory(name=state["shm"])
+        self.frames = np.ndarray((self.num_slots, *self.shape), dtype=np.uint8, buffer=self.shm.buf)
+        self._owner = False
+
+    def acquire(self, consumers: int = 1, timeout: float = None) -> int:
+        """
+        A free slot is taken.
+
+        Args:
+            consumers (int): Number of consumers that will release the slot.
+            timeout (float): Waiting time for a free slot.
+        Returns:
+            int: Slot index.
+        """
+        slot = self.free.get(timeout=timeout)
+        self.refs[slot] = consumers
+        return slot
+
+    def release(self, slot: int) -> None:
+        """
+        The slot is given back once all its consumers have released it.
+
+        Args:
+            slot (int): Slot index.
+        """
+        with self.refs.get_lock():
+            self.refs[slot] -= 1
+            if self.refs[slot] == 0:
+                self.free.put(slot)
+
+    def close(self) -> None:
+        """The shared memory is closed, and removed by its owner."""
+        del self.frames
+        try:
+            self.shm.close()
+        except BufferError:
+            # Frame views still held by the caller, the mapping is released with them.
+            pass
+        if self._owner:
+            self.shm.unlink()
+
+
+def decode_worker(ring: SharedFrameRing, reader: Callable, frames: mp.Queue, stop) -> None:
+    """
+    Video frames are decoded into the ring slots.
+
+    Args:
+        ring (SharedFrameRing): Shared frame slots.
+        reader (Callable): Creates the video reader.
+        frames (Queue): Frame numbers and slot indices.
+        stop (Event): Stop signal.
+    """
+    video_frames = reader()
+    try:
+        for frame_id, frame in video_frames:
+            slot = None
+            while slot is None and not stop.is_set():
+                try:
+                    slot = ring.acquire(timeout=0.1)
+                except queue.Empty:
+                    pass
+            if slot is None:
+                break
+            ring.frames[slot][:] = frame
+            frames.put((frame_id, slot))
+    finally:
+        video_frames.close()
+    # The end is only signalled after a normal finish, a crash is seen by its exit code.
+    frames.put(None)
+
+
+def infer_worker(ring: SharedFrameRing, model_path: str, task: str, detect_every: int, frames: mp.Queue,
+                 results: mp.Queue) -> None:
+    """
+    Detections of the frames in the ring slots are calculated.
+
+    Args:
+        ring (SharedFrameRing): Shared frame slots.
+        model_path (str): Path to the model file.
+        task (str): Computer vision task type.
+        detect_every (int): Detection period in frames, None is sent for the other frames.
+        frames (Queue): Frame numbers and slot indices.
+        results (Queue): Frame numbers, slot indices and detections.
+    """
+    model = YOLOModel(model_path, task)
+    for frame_id, slot in iter(frames.get, None):
+        detections = None
+        if (frame_id - 1) % detect_every == 0:
+            detections = ProcessCalculate.get_detections(model(ring.frames[slot])[0], task)
+        results.put((frame_id, slot, detections))
+    results.put(None)
+
+
+class FramePipeline:
+    def __init__(self, reader: Callable, model_path: str, task: str, imgsz: tuple, detect_every: int = 1,
+                 num_slots: int = 8, timeout: float = 1.0) -> None:
+        """
+        Decoding and inference run in separate processes, frames are passed through shared memory.
+
+        Args:
+            reader (Callable): Creates the video reader.
+            model_path (str): Path to the model file.
+            task (str): Computer vision task type.
+            imgsz (tuple): The size of the video frame.
+            detect_every (int): Detection period in frames.
+            num_slots (int): Number of frames in flight.
+            timeout (float): Polling period of the results while the workers are checked.
+        """
+        self.reader = reader
+        self.model_path = model_path
+        self.task = task
+        self.imgsz = imgsz
+        self.detect_every = detect_every
+        self.num_slots = num_slots
+        self.timeout = timeout
+        self.ring = None
+        self.stop = None
+        self.workers = list()
+        self._frames = None
+        self._results = None
+
+    def __enter__(self):
+        ctx = mp.get_context("spawn")
+        self.ring = SharedFrameRing(self.num_slots, (*self.imgsz, 3), ctx)
+        self.stop = ctx.Event()
+        # Queues are kept here, the children unpickle them after start() has returned.
+        self._frames = ctx.Queue()
+        self._results = ctx.Queue()
+        self.workers = [
+            ctx.Process(target=decode_worker, args=(self.ring, self.reader, self._frames, self.stop), daemon=True),
+            ctx.Process(target=infer_worker, args=(self.ring, self.model_path, self.task, self.detect_every,
+                                                   self._frames, self._results), daemon=True),
+        ]
+        for worker in self.workers:
+            worker.start()
+        return self
+
+    def check_workers(self) -> None:
+        """
+        Raises:
+            RuntimeError: A worker exited with an error.
+        """
+        for worker in self.workers:
+            if worker.exitcode not in [None, 0]:
+                raise RuntimeError(f"Pipeline worker {worker.name} exited with code {worker.exitcode}")
+
+    def __iter__(self) -> Iterator[tuple]:
+        """
+        Returns:
+            Iterator[tuple]: Frame number, video frame and detections.
+        """
+        while True:
+            try:
+                item = self._results.get(timeout=self.timeout)
+            except queue.Empty:
+                # The decoder exits with 0 once the video ends, while inference may still run.
+                self.check_workers()
+                continue
+            if item is None:
+                for worker in self.workers:
+                    worker.join(timeout=self.timeout)
+                self.check_workers()
+                break
+
+            frame_id, slot, detections = item
+            try:
+                yield frame_id, self.ring.frames[slot], detections
+            finally:
+                self.ring.release(slot)
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop.set()
+        for worker in self.workers:
+            worker.join(timeout=1)
+            if worker.is_alive():
+                worker.terminate()
+        self.ring.close()
@@ -0,0 +1,364 @@
+import numpy as np
+from numpy import ndarray
+from typing import Optional, Tuple
+
+
+class ProcessTracker:
+    def __init__(self, imgsz: tuple, metric: str = "iou", match: str = "greedy", threshold: float = 0.3,
+                 max_age: int = 30, min_hits: int = 1, detect_every: int = 1, momentum: float = 0.5):
+        """
+        Tracker that assigns track ids to the detections of any model.
+
+        Args:
+            imgsz (tuple): The size of the video frame.
+            metric (str): Association metric, "iou" or "centroid".
+            match (str): Assignment method, "greedy" or "hungarian".
+            threshold (float): Minimum IoU, or maximum centroid distance relative to the track diagonal.
+            max_age (int): Number of frames a track is kept without detections.
+            min_hits (int): Number of detections before a track is reported.
+            detect_every (int): Detection period in frames, the other frames are predicted.
+            momentum (float): Smoothing of the track velocity.
+        """
+        self.imgsz = imgsz
+        self.metric = metric
+        self.match = match
+        self.threshold = threshold
+        self.max_age = max_age
+        self.min_hits = min_hits
+        self.detect_every = detect_every
+        self.momentum = momentum
+        self.next_id = 1
+        self.boxes = np.empty((0, 4), dtype=np.float32)
+        self.velocity = np.empty((0, 4), dtype=np.float32)
+        self.ids = np.empty(0, dtype=int)
+        self.age = np.empty(0, dtype=int)
+        self.hits = np.empty(0, dtype=int)
+        self.misses = np.empty(0, dtype=int)
+        self.confidence = np.empty(0, dtype=np.float32)
+        self.class_id = np.empty(0, dtype=int)
+
+    @staticmethod
+    def box_iou(boxes1: ndarray, boxes2: ndarray) -> ndarray:
+        """
+        IoU of box pairs.
+
+        Args:
+            boxes1 (ndarray): Boxes in xyxy format, (P, 4).
+            boxes2 (ndarray): Boxes in xyxy format, (P, 4).
+        Returns:
+            ndarray: IoU of each pair, (P,).
+        """
+        width = np.minimum(boxes1[:, 2], boxes2[:, 2]) - np.maximum(boxes1[:, 0], boxes2[:, 0])
+        height = np.minimum(boxes1[:, 3], boxes2[:, 3]) - np.maximum(boxes1[:, 1], boxes2[:, 1])
+        inter = np.clip(width, 0, None) * np.clip(height, 0, None)
+        area1 = (boxes1[:, 2] - boxes1[:, 0]) * (boxes1[:, 3] - boxes1[:, 1])
+        area2 = (boxes2[:, 2] - boxes2[:, 0]) * (boxes2[:, 3] - boxes2[:, 1])
+        return inter / (area1 + area2 - inter + 1e-9)
+
+    def get_pairs(self, boxes: ndarray) -> Tuple[ndarray, ndarray, ndarray, float]:
+        """
+        Candidate pairs of tracks and detections, with their association cost.
+
+        Only pairs whose centers are close enough to pass the threshold are kept, they are found
+        by a search over the detections sorted by x and then filtered by y, so no dense
+        (tracks, detections) matrix is built.
+
+        Args:
+            boxes (ndarray): Detection boxes in xyxy format.
+        Returns:
+            Tuple[ndarray, ndarray, ndarray, float]: Track indices, detection indices, costs and the
+            maximum accepted cost.
+        """
+        track_centers = (self.boxes[:, :2] + self.boxes[:, 2:]) * np.float32(0.5)
+        centers = (boxes[:, :2] + boxes[:, 2:]) * np.float32(0.5)
+        track_sizes = self.boxes[:, 2:] - self.boxes[:, :2]
+        if self.metric == "iou":
+            # Boxes overlap only if their centers are closer than half of their summed sizes.
+            radius = (track_sizes + (boxes[:, 2:] - boxes[:, :2]).max(axis=0)) * np.float32(0.5)
+            max_cost = 1 - self.threshold
+        elif self.metric == "centroid":
+            diagonal = np.hypot(track_sizes[:, 0], track_sizes[:, 1]) + np.float32(1e-9)
+            radius = np.repeat(diagonal[:, None] * np.float32(self.threshold), 2, axis=1)
+            max_cost = self.threshold
+        else:
+            raise ValueError(f"Unsupported tracker metric: {self.metric}")
+
+        # Boxes clipped at the frame edge may be inverted.
+        radius = np.maximum(radius, 0)
+        order = np.argsort(centers[:, 0], kind="stable")
+        sorted_x = centers[order, 0]
+        low = np.searchsorted(sorted_x, track_centers[:, 0] - radius[:, 0], side="left")
+        high = np.searchsorted(sorted_x, track_centers[:, 0] + radius[:, 0], side="right")
+        counts = high - low
+        rows = np.repeat(np.arange(len(self.boxes)), counts)
+        offsets = np.arange(len(rows)) - np.repeat(np.cumsum(counts) - counts, counts)
+        cols = order[np.repeat(low, counts) + offsets]
+        # take gathers the candidates several times faster than fancy indexing.
+        near = np.abs(track_centers[:, 1].take(rows) - centers[:, 1].take(cols)) <= radius[:, 1].take(rows)
+        rows, cols = rows[near], cols[near]
+
+        if self.metric == "iou":
+            cost = 1 - self.box_iou(self.boxes.take(rows, axis=0), boxes.take(cols, axis=0))
+        else:
+            offset = track_centers.take(rows, axis=0) - centers.take(cols, axis=0)
+            cost = np.hypot(offset[:, 0], offset[:, 1]) / diagonal.take(rows)
+        keep = cost <= max_cost
+        return rows[keep], cols[keep], cost[keep], max_cost
+
+    @staticmethod
+    def first_of_groups(groups: ndarray, cost: ndarray) -> ndarray:
+        """
+        Args:
+            groups (ndarray): Group of each pair.
+            cost (ndarray): Cost of each pair.
+        Returns:
+            ndarray: Index of the lowest cost pair of each group.
+        """
+        order = np.lexsort((cost, groups))
+        sorted_groups = groups[order]
+        first = np.ones(len(order), dtype=bool)
+        first[1:] = sorted_groups[1:] != sorted_groups[:-1]
+        return order[first]
+
+    @classmethod
+    def greedy_match(cls, rows: ndarray, cols: ndarray, cost: ndarray) -> Tuple[ndarray, ndarray]:
+        """
+        Pairs that are each other's lowest cost are matched, repeated on the remaining pairs.
+
+        Args:
+            rows (ndarray): Track index of the candidate pairs.
+            cols (ndarray): Detection index of the candidate pairs.
+            cost (ndarray): Cost of the candidate pairs.
+        Returns:
+            Tuple[ndarray, ndarray]: Matched track and detection indices.
+        """
+        matched_rows, matched_cols = list(), list()
+        row_done = np.zeros(rows.max() + 1 if len(rows) else 0, dtype=bool)
+        col_done = np.zeros(cols.max() + 1 if len(cols) else 0, dtype=bool)
+        while len(cost):
+            row_best = np.zeros(len(cost), dtype=bool)
+            row_best[cls.first_of_groups(rows, cost)] = True
+            mutual = cls.first_of_groups(cols, cost)
+            mutual = mutual[row_best[mutual]]
+            if not len(mutual):
+                break
+            matched_rows.append(rows[mutual])
+            matched_cols.append(cols[mutual])
+            row_done[rows[mutual]] = True
+            col_done[cols[mutual]] = True
+            keep = ~(row_done[rows] | col_done[cols])
+            rows, cols, cost = rows[keep], cols[keep], cost[keep]
+
+        if not matched_rows:
+            return np.empty(0, dtype=int), np.empty(0, dtype=int)
+        return np.concatenate(matched_rows), np.concatenate(matched_cols)
+
+    @staticmethod
+    def hungarian_match(rows: ndarray, cols: ndarray, cost: ndarray, max_cost: float) -> Tuple[ndarray, ndarray]:
+        """
+        Optimal assignment of the tracks to the detections.
+
+        Pairs whose track and detection have no other candidate are matched directly, the
+        assignment is solved only for the contested tracks and detections.
+
+        Args:
+            rows (ndarray): Track index of the candidate pairs.
+            cols (ndarray): Detection index of the candidate pairs.
+            cost (ndarray): Cost of the candidate pairs.
+            max_cost (float): Maximum accepted cost.
+        Returns:
+            Tuple[ndarray, ndarray]: Matched track and detection indices.
+        """
+        from scipy.optimize import linear_sum_assignment
+
+        if not len(cost):
+            return rows, cols
+        single = (np.bincount(rows)[rows] == 1) & (np.bincount(cols)[cols] == 1)
+        rows_left, cols_left, cost_left = rows[~single], cols[~single], cost[~single]
+        if not len(cost_left):
+            return rows[single], cols[single]
+
+        unique_rows, row_index = np.unique(rows_left, return_inverse=True)
+        unique_cols, col_index = np.unique(cols_left, return_inverse=True)
+        dense = np.full((len(unique_rows), len(unique_cols)), max_cost + 1, dtype=np.float32)
+        dense[row_index, col_index] = cost_left
+        sub_rows, sub_cols = linear_sum_assignment(dense)
+        keep = dense[sub_rows, sub_cols] <= max_cost
+        return (np.concatenate([rows[single], unique_rows[sub_rows[keep]]]),
+                np.concatenate([cols[single], unique_cols[sub_cols[keep]]]))
+
+    def move(self) -> None:
+        """
+        Tracks are moved one frame with their velocity.
+        """
+        self.boxes += self.velocity
+        self.boxes[:, 0::2] = np.clip(self.boxes[:, 0::2], 0, self.imgsz[1] - 1)
+        self.boxes[:, 1::2] = np.clip(self.boxes[:, 1::2], 0, self.imgsz[0] - 1)
+        self.age += 1
+
+    def predict(self) -> dict:
+        """
+        Tracks are predicted on a frame without detections.
+
+        Returns:
+            dict: Detections of the tracks matched on the last detection frame.
+        """
+        self.move()
+        return self.get_detections(self.misses == 0)
+
+    def update(self, detections: dict) -> dict:
+        """
+        Tracks are predicted and matched with the detections.
+
+        Args:
+            detections (dict): Detections of the model.
+        Returns:
+            dict: Detections with track ids.
+        """
+        self.move()
+        boxes = detections["xyxy"].astype(np.float32)
+        rows, cols = np.empty(0, dtype=int), np.empty(0, dtype=int)
+        if len(self.boxes) and len(boxes):
+            pair_rows, pair_cols, cost, max_cost = self.get_pairs(boxes)
+            if self.match == "greedy":
+                rows, cols = self.greedy_match(pair_rows, pair_cols, cost)
+            elif self.match == "hungarian":
+                rows, cols = self.hungarian_match(pair_rows, pair_cols, cost, max_cost)
+            else:
+                raise ValueError(f"Unsupported tracker match: {self.match}")
+
+        # Velocity is measured since the last match, which spans the skipped frames.
+        matched_boxes = boxes.take(cols, axis=0)
+        velocity = self.velocity.take(rows, axis=0)
+        age = self.age.take(rows)[:, None]
+        prev = self.boxes.take(rows, axis=0) - velocity * age
+        self.velocity[rows] = self.momentum * velocity + (1 - self.momentum) * (matched_boxes - prev) / age
+        self.boxes[rows] = matched_boxes
+        self.age[rows] = 0
+        self.hits[rows] += 1
+        self.confidence[rows] = detections["confidence"][cols]
+        self.class_id[rows] = detections["class_id"][cols]
+
+        self.misses += 1
+        self.misses[rows] = 0
+        alive = self.age <= self.max_age
+        matched = np.zeros(len(self.boxes), dtype=bool)
+        matched[rows] = True
+        self.remove(alive)
+        matched = matched[alive]
+
+        new = np.ones(len(boxes), dtype=bool)
+        new[cols] = False
+        self.add(boxes[new], detections["confidence"][new], detections["class_id"][new])
+        visible = np.concatenate([matched, np.ones(new.sum(), dtype=bool)])
+
+        return self.get_detections(visible)
+
+    def remove(self, keep: ndarray) -> None:
+        """
+        Tracks are filtered.
+
+        Args:
+            keep (ndarray): Mask of the tracks to keep.
+        """
+        for name in ["boxes", "velocity", "ids", "age", "hits", "misses", "confidence", "class_id"]:
+            setattr(self, name, getattr(self, name)[keep])
+
+    def add(self, boxes: ndarray, confidence: ndarray, class_id: ndarray) -> None:
+        """
+        New tracks are started.
+
+        Args:
+            boxes (ndarray): Boxes in xyxy format.
+            confidence (ndarray): Confidence of the boxes.
+            class_id (ndarray): Class of the boxes.
+        """
+        n = len(boxes)
+        self.boxes = np.concatenate([self.boxes, boxes])
+        self.velocity = np.concatenate([self.velocity, np.zeros((n, 4), dtype=np.float32)])
+        self.ids = np.concatenate([self.ids, np.arange(self.next_id, self.next_id + n)])
+        self.age = np.concatenate([self.age, np.zeros(n, dtype=int)])
+        self.hits = np.concatenate([self.hits, np.ones(n, dtype=int)])
+        self.misses = np.concatenate([self.misses, np.zeros(n, dtype=int)])
+        self.confidence = np.concatenate([self.confidence, confidence.astype(np.float32)])
+        self.class_id = np.concatenate([self.class_id, class_id.astype(int)])
+        self.next_id += n
+
+    def get_detections(self, visible: ndarray) -> dict:
+        """
+        Creates a dictionary containing the tracks.
+
+        Args:
+            visible (ndarray): Mask of the tracks to report.
+        Returns:
+            dict: Returns the tracks in the form of the model detections.
+        """
+        keep = visible & (self.hits >= self.min_hits)
+        xyxy = self.boxes[keep]
+        detections = dict()
+        detections["xyxy"] = xyxy
+        detections["xywh"] = np.column_stack(((xyxy[:, :2] + xyxy[:, 2:]) / 2, xyxy[:, 2:] - xyxy[:, :2]))
+        detections["confidence"] = self.confidence[keep]
+        detections["class_id"] = self.class_id[keep]
+        detections["track_id"] = self.ids[keep]
+        return detections
+
+    def __call__(self, detections: Optional[dict] = None) -> dict:
+        """
+        Args:
+            detections (dict): Detections of the model, predicted only if None.
+        Returns:
+            dict: Detections with track ids.
+        """
+        if detections is None:
+            return self.predict()
+        return self.update(detections)
+
+
+def benchmark(match: str = "greedy", metric: str = "iou", num_people: int = 300, num_frames: int = 300,
+              imgsz: tuple = (1080, 1920)) -> float:
+    """
+    Time of a tracker update with people moving across the frame.
+
+    Args:
+        match (str): Assignment method, "greedy" or "hungarian".
+        metric (str): Association metric, "iou" or "centroid".
+        num_people (int): Number of detections in each frame.
+        num_frames (int): Number of updated frames.
+        imgsz (tuple): The size of the video frame.
+    Returns:
+        float: Median update time in milliseconds.
+    """
+    import time
+
+    rng = np.random.default_rng(0)
+    size = rng.uniform([30, 60], [60, 120], (num_people, 2)).astype(np.float32)
+    limit = np.array([imgsz[1], imgsz[0]], dtype=np.float32) - size - 1
+    position = rng.uniform(0, limit).astype(np.float32)
+    velocity = rng.normal(0, 2, (num_people, 2)).astype(np.float32)
+    tracker = ProcessTracker(imgsz, metric=metric, match=match)
+    times = list()
+    for _ in range(num_frames):
+        position += velocity
+        # People turn back at the frame edge.
+        outside = (position < 0) | (position > limit)
+        velocity[outside] *= -1
+        np.clip(position, 0, limit, out=position)
+        detections = {"xyxy": np.hstack([position, position + size]),
+                      "confidence": np.ones(num_people, dtype=np.float32),
+                      "class_id": np.zeros(num_people, dtype=int)}
+        start = time.perf_counter()
+        tracker(detections)
+        times.append(time.perf_counter() - start)
+    return float(np.median(times[10:]) * 1e3)
+
+
+if __name__ == "__main__":
+    budget = 1.0
+    # Warm-up, the first frames of a process are slower.
+    benchmark(num_frames=50)
+    for match in ["greedy", "hungarian"]:
+        for metric in ["iou", "centroid"]:
+            update_time = benchmark(match, metric)
+            print(f"{match} {metric}: {update_time:.3f} ms")
+            assert update_time < budget, f"{match} {metric} update takes {update_time:.3f} ms, budget {budget} ms"
@@ -1,4 +1,9 @@
+import os
 import json
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
 
 
 class JSONFile:
@@ -27,6 +32,22 @@ class JSONFile:
     def task(self):
         return self.cfg_dict["task"]
 
+    @property
+    def decoder(self):
+        return self.cfg_dict.get("decoder", dict())
+
+    @property
+    def tracker(self):
+        return self.cfg_dict.get("tracker")
+
+    @property
+    def heatmap(self):
+        return self.cfg_dict.get("heatmap")
+
+    @property
+    def clips(self):
+        return self.cfg_dict.get("clips")
+
     @property
     def get_cfg_dict(self):
         return self.cfg_dict
@@ -60,3 +81,74 @@ class CFGRead:
             return writer
         else:
             raise "Unsupported file type."
+
+
+class CFGWatcher:
+    def __init__(self, file_path, build, zones, interval=1.0):
+        """
+        The cfg file is watched in a background thread, the areas are rebuilt when it changes.
+
+        Args:
+            file_path (str): Path to cfg file.
+            build (Callable): Builds the zones from the areas of the cfg and the previously built zones.
+            zones (tuple): Areas of the cfg, processed areas and masks in use.
+            interval (float): Polling period of the cfg file in seconds.
+        """
+        self.file_path = file_path
+        self.build = build
+        self.interval = interval
+        self._zones = None
+        self._built = zones
+        self._mtime = os.path.getmtime(file_path)
+        self._lock = threading.Lock()
+        self._reload = threading.Event()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self.run, daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._reload.set()
+        self._thread.join()
+
+    def request(self):
+        """Reload without waiting for a file change."""
+        self._reload.set()
+
+    def pop(self):
+        """
+        Returns:
+            tuple: Areas of the cfg, processed areas and masks. None if nothing was rebuilt.
+        """
+        with self._lock:
+            zones, self._zones = self._zones, None
+        return zones
+
+    def run(self):
+        while not self._stop.is_set():
+            requested = self._reload.wait(self.interval)
+            self._reload.clear()
+            if self._stop.is_set():
+                break
+            try:
+                mtime = os.path.getmtime(self.file_path)
+            except OSError as e:
+                # Editors that save by replacing the file leave it missing for a moment.
+                logger.warning("Cfg file could not be checked: %s", e)
+                continue
+            if not requested and mtime == self._mtime:
+                continue
+            self._mtime = mtime
+            try:
+                areas = CFGRead(file_path=self.file_path).read_file().areas
+                zones = self.build(areas, self._built)
+            except Exception:
+                # The previous areas stay in use, the file is read again on the next change.
+                logger.exception("Areas could not be reloaded from %s", self.file_path)
+                continue
+            self._built = zones
+            with self._lock:
+                self._zones = zones
@@ -1,5 +1,9 @@
 import cv2
+import tempfile
+import subprocess
+import numpy as np
 from dataclasses import dataclass
+from functools import partial
 from typing import Optional
 
 
@@ -43,27 +47,154 @@ class GetVideo:
             self.cap.release()
             raise StopIteration
 
+    def close(self):
+        self.cap.release()
+
+
+class GetFFmpegVideo:
+
+    def __init__(self, source_path: str, imgsz: tuple, fps: Optional[int] = None, threads: int = 0):
+        """
+        Video frames decoded by an ffmpeg subprocess, scaled to imgsz inside the decoder.
+
+        Args:
+            source_path (str): Video file path.
+            imgsz (tuple): The size of the output frames.
+            fps (int): Output frame rate, the source frame rate if None.
+            threads (int): Number of decoder threads, automatic if 0.
+        """
+        self.frame_id = 0
+        self.source_path = source_path
+        filters = [f"fps={fps}"] if fps else []
+        filters.append(f"scale={imgsz[1]}:{imgsz[0]}")
+        command = ["ffmpeg", "-loglevel", "error", "-nostdin", "-threads", str(threads), "-i", self.source_path,
+                   "-vf", ",".join(filters), "-f", "rawvideo", "-pix_fmt", "bgr24", "pipe:1"]
+        # A file rather than a pipe, so that a long error output can not block ffmpeg.
+        self._stderr = tempfile.TemporaryFile()
+        self.proc = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=self._stderr)
+        self._closed = False
+        self.frame = np.empty((*imgsz, 3), dtype=np.uint8)
+        self._buffer = memoryview(self.frame).cast("B")
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        # The frame buffer is reused, the previous frame is overwritten.
+        size = 0
+        while size < len(self._buffer):
+            n = self.proc.stdout.readinto(self._buffer[size:])
+            if not n:
+                self.close(finished=True)
+                raise StopIteration
+            size += n
+        self.frame_id += 1
+        return self.frame_id, self.frame
+
+    def close(self, finished: bool = False):
+        """
+        The ffmpeg process is ended.
+
+        Args:
+            finished (bool): The output has ended, ffmpeg is waited for instead of stopped.
+        Raises:
+            RuntimeError: ffmpeg exited with an error.
+        """
+        if self._closed:
+            return
+        self._closed = True
+        killed = not finished and self.proc.poll() is None
+        if killed:
+            self.proc.kill()
+        self.proc.stdout.close()
+        returncode = self.proc.wait()
+        self._stderr.seek(0)
+        message = self._stderr.read().decode(errors="replace").strip()
+        self._stderr.close()
+        if not killed and returncode != 0:
+            raise RuntimeError(f"ffmpeg exited with code {returncode} for {self.source_path}: {message}")
+
 
 class ProcessVideo:
-    def __init__(self, source_path: str, target_path: str = "./result.mp4", save: bool = False):
+    def __init__(self, source_path: str, target_path: str = "./result.mp4", save: bool = False,
+                 backend: str = "opencv", width: Optional[int] = None, fps: Optional[int] = None, threads: int = 0):
+        """
+        Video reading and writing.
+
+        Args:
+            source_path (str): Video file path.
+            target_path (str): Path of the processed video.
+            save (bool): Recording the processed video.
+            backend (str): Video reader, "opencv" or "ffmpeg".
+            width (int): Width of the frames decoded by ffmpeg, the source width if None.
+            fps (int): Frame rate of the frames decoded by ffmpeg, the source frame rate if None.
+            threads (int): Number of ffmpeg decoder threads, automatic if 0.
+        """
         self.source_path = source_path
         self.target_path = target_path
         self.save = save
-        self.video_frames = None
+        self.backend = backend
+        self.width = width
+        self.decode_fps = fps
+        self.threads = threads
+        self.reader = None
+        self._video_frames = None
         self.out = None
+        self.source_imgsz = None
         self.imgsz = None
+        self.scale = None
+        self.fps = None
+
+    def get_reader(self, video_info: InfoVideo) -> partial:
+        """
+        The video reader of the backend is set.
+
+        Args:
+            video_info (InfoVideo): Video information.
+        Returns:
+            partial: Creates a new video reader.
+        """
+        if self.backend == "opencv":
+            self.imgsz = self.source_imgsz
+            self.fps = video_info.fps
+            return partial(GetVideo, source_path=self.source_path)
+
+        elif self.backend == "ffmpeg":
+            width = self.width or video_info.width
+            height = round(video_info.height * width / video_info.width / 2) * 2
+            self.imgsz = (height, width)
+            self.fps = self.decode_fps or video_info.fps
+            return partial(GetFFmpegVideo, source_path=self.source_path, imgsz=self.imgsz,
+                           fps=self.decode_fps, threads=self.threads)
+
+        raise ValueError(f"Unsupported video backend: {self.backend}")
+
+    @property
+    def video_frames(self):
+        """
+        The video reader is opened on first use, so a reader used elsewhere does not decode twice.
+
+        Returns:
+            -: Video reader in this process.
+        """
+        if self._video_frames is None:
+            self._video_frames = self.reader()
+        return self._video_frames
 
     def __enter__(self):
         video_info = InfoVideo.get_video_writer(source_path=self.source_path)
-        self.video_frames = GetVideo(source_path=self.source_path)
-        self.imgsz = (video_info.height, video_info.width)
+        self.source_imgsz = (video_info.height, video_info.width)
+        self.reader = self.get_reader(video_info)
+        self.scale = (self.imgsz[1] / video_info.width, self.imgsz[0] / video_info.height)
         if self.save:
             fourcc = cv2.VideoWriter_fourcc(*"mp4v")
-            self.out = cv2.VideoWriter(self.target_path, fourcc, video_info.fps, (video_info.width, video_info.height))
+            self.out = cv2.VideoWriter(self.target_path, fourcc, self.fps, (self.imgsz[1], self.imgsz[0]))
 
         return self
 
     def __exit__(self, exc_type, exc_val, exc_tb):
+        if self._video_frames is not None:
+            self._video_frames.close()
         if self.out:
             self.out.release()
         cv2.destroyAllWindows()